@@ -0,0 +1,65 @@
+import asyncio
+import functools
+from cachetools import TTLCache
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# =================================================================
+# CACHE TTL EN MÉMOIRE POUR LES ENDPOINTS D'ANALYSE
+# Cache local au process : avec plusieurs workers, chacun a le sien.
+# =================================================================
+
+# Génération des données : incrémentée à chaque écriture sur les dimensions.
+# Elle fait partie de la clé, donc les entrées des générations précédentes
+# ne sont plus jamais lues (elles expirent ensuite avec leur TTL).
+_generation = 0
+
+
+def bump_generation():
+    """
+    Invalide tous les résultats en cache (à appeler après un POST/PUT/DELETE).
+    """
+    global _generation
+    _generation += 1
+
+
+def cached(ttl: int = 60, maxsize: int = 1024):
+    """
+    Décorateur de route FastAPI : met en cache le résultat selon les paramètres
+    de la requête (la session DB est exclue de la clé). Un verrou par clé évite
+    que plusieurs requêtes simultanées recalculent le même résultat.
+    """
+    def decorator(func):
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        locks = {}
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            params = tuple(sorted(
+                (name, value) for name, value in kwargs.items()
+                if not isinstance(value, AsyncSession)
+            ))
+            key = (_generation, params)
+
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+            # [verrou, nombre de requêtes qui l'utilisent] : le verrou n'est retiré
+            # qu'au départ de la dernière, sinon une requête arrivée entre-temps
+            # en créerait un nouveau et recalculerait le résultat en parallèle.
+            entry = locks.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    value = cache.get(key)
+                    if value is None:
+                        value = await func(*args, **kwargs)
+                        cache[key] = value
+                    return value
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    locks.pop(key, None)
+
+        return wrapper
+    return decorator
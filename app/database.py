@@ -1,7 +1,11 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase # Typiquement nécessaire pour les modèles
 import os
+import orjson
+from typing import AsyncIterator
+from decimal import Decimal
 from dotenv import load_dotenv
 
 # --- 1. Configuration de l'environnement ---
@@ -17,9 +21,22 @@ DATABASE_URL = (
 
 # --- 2. Configuration de l'Engine et de la Session Asynchrone ---
 
+# SQL_ECHO=1 pour journaliser chaque requête (debug uniquement : coûteux en production)
 engine = create_async_engine(
-     DATABASE_URL,
-    echo=True,
+    DATABASE_URL,
+    echo=os.getenv("SQL_ECHO", "0") == "1",
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,     # Attente max d'une connexion libre avant erreur (au lieu de bloquer)
+    pool_pre_ping=True,
+    pool_recycle=1800,   # Renouvelle les connexions de plus de 30 min (coupures serveur/proxy)
+    connect_args={
+        # Caches de requêtes préparées par connexion (asyncpg + adaptateur SQLAlchemy)
+        "statement_cache_size": 512,
+        "prepared_statement_cache_size": 512,
+        # Requêtes courtes et répétées : la compilation JIT coûte plus qu'elle ne rapporte
+        "server_settings": {"jit": "off"},
+    },
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -35,20 +52,39 @@ class Base(DeclarativeBase):
 
 # --- 3. Dépendance FastAPI pour la gestion des Sessions Asynchrones ---
 
-async def get_db() -> AsyncSession:
-  """
-  Dépendance asynchrone pour fournir une session DB (AsyncSession)
-  aux gestionnaires de routes (FastAPI dependency).
-  """
-  async with AsyncSessionLocal() as session:
-    try:
-        yield session
-    finally:
-            await session.close() # S'assurer que la session est fermée
+async def get_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dépendance asynchrone pour fournir une session DB (AsyncSession)
+    aux gestionnaires de routes (FastAPI dependency).
+    Une transaction par requête, annulée si le handler lève une exception.
+    Les handlers d'écriture committent eux-mêmes avant de répondre : avec
+    FastAPI 0.95, la sortie de cette dépendance n'a lieu qu'après l'envoi
+    de la réponse. La sortie du bloc `async with` ferme la session.
+    """
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            yield session
 
 # --- 4. Initialisation de l'Application FastAPI ---
 
-app = FastAPI(title="Vélib Analytics API")
+def _orjson_default(obj):
+    # Les colonnes NUMERIC (AVG, durées) arrivent en Decimal, non géré nativement par orjson
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+def dumps_json(content) -> bytes:
+    return orjson.dumps(content, default=_orjson_default)
+
+class VelibJSONResponse(ORJSONResponse):
+    """
+    Réponse JSON sérialisée par orjson (plus rapide que json.dumps),
+    capable d'émettre directement des lignes SQL brutes.
+    """
+    def render(self, content) -> bytes:
+        return dumps_json(content)
+
+app = FastAPI(title="Vélib Analytics API", default_response_class=VelibJSONResponse)
 
 
 
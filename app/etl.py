@@ -1,8 +1,16 @@
 # app/etl.py
 import os
+import re
+import io
+import csv
 import json
 import gzip
+import orjson
+import time
 import logging
+from collections import deque
+from operator import itemgetter
+from concurrent.futures import ProcessPoolExecutor
 import psycopg2
 from psycopg2.extras import execute_values
 from dotenv import load_dotenv
@@ -20,6 +28,11 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DATA_FOLDER = os.getenv("DATA_FOLDER")
 PROGRESS_FILE = os.getenv("PROGRESS_FILE", "progress.json")
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "200"))  # Nombre de fichiers par transaction
+PROGRESS_SAVE_EVERY = int(os.getenv("PROGRESS_SAVE_EVERY", "500"))  # Fichiers validés entre deux sauvegardes
+PROGRESS_SAVE_INTERVAL = float(os.getenv("PROGRESS_SAVE_INTERVAL", "10"))  # Secondes max entre deux sauvegardes
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))  # Process dédiés au parsing
+PBAR_UPDATE_EVERY = 50  # Fichiers traités entre deux mises à jour de la barre de progression
 
 # --- 3. Configuration des logs ---
 logging.basicConfig(filename="data_import_errors.log", level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -64,219 +77,493 @@ def load_progress():
 def save_progress(progress):
     """
     Sauvegarde l'état actuel du progrès dans le fichier progress.json.
+    Écriture dans un fichier temporaire puis renommage atomique,
+    pour ne jamais laisser un progress.json tronqué en cas de crash.
     """
-    with open(PROGRESS_FILE, "w", encoding="utf-8") as f:
-        json.dump(progress, f, indent=4)
+    tmp_file = PROGRESS_FILE + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"done": sorted(progress["done"])}, f, indent=4)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, PROGRESS_FILE)
 
 def rebuild_progress_from_database():
     """
     Reconstruit le fichier progress.json à partir des snapshots existants en base de données.
     """
+    # 1. Associer chaque fichier du dossier à son timestamp (fichiers au nom invalide ignorés)
+    filename_to_ts = {}
+    for filename in iter_data_files(DATA_FOLDER):
+        timestamp = parse_timestamp_from_filename(filename)
+        if timestamp is not None:
+            filename_to_ts[filename] = timestamp
+
+    # 2. Ne récupérer en base que les snapshots correspondant à ces fichiers
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # 1. Lire tous les timestamps déjà importés
-    cursor.execute("SELECT timestamp_capture FROM snapshot;")
+    cursor.execute(
+        "SELECT timestamp_capture FROM snapshot WHERE timestamp_capture = ANY(%s);",
+        (list(set(filename_to_ts.values())),)
+    )
     existing_snapshots = {row[0] for row in cursor.fetchall()}
 
     cursor.close()
     conn.close()
 
-    print(f"   → {len(existing_snapshots)} snapshots trouvés en base.")
-
-    # 2. Récupérer tous les fichiers disponibles dans le dossier
-    all_files = [f for f in os.listdir(DATA_FOLDER) if f.endswith(('.json', '.gz'))]
-
-    done_files = []
+    print(f"   → {len(existing_snapshots)} snapshots correspondants trouvés en base.")
 
-    # 3. Vérifier si le fichier a déjà été traité
-    for filename in all_files:
-        timestamp = parse_timestamp_from_filename(filename)
-        if timestamp in existing_snapshots:
-            done_files.append(filename)
+    # 3. Les fichiers dont le snapshot existe sont considérés comme traités
+    done_files = [f for f, ts in filename_to_ts.items() if ts in existing_snapshots]
 
     print(f"   → {len(done_files)} fichiers déjà traités détectés.")
 
     return {"done": done_files}
 
-# --- 6. Parser le timestamp depuis le nom du fichier ---
+# --- 6. Lecture des fichiers ---
+def iter_data_files(folder):
+    """
+    Itère sur les noms des fichiers .json / .gz du dossier, sans construire de liste intermédiaire.
+    """
+    with os.scandir(folder) as it:
+        for entry in it:
+            name = entry.name
+            if (name.endswith('.gz') or name.endswith('.json')) and entry.is_file():
+                yield name
+
+def read_file_bytes(filepath):
+    """
+    Retourne le contenu brut (décompressé) d'un fichier .json ou .json.gz.
+    Les .gz sont décompressés en un seul appel plutôt que par blocs de 8 Ko.
+    """
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    if filepath.endswith('.gz'):
+        return gzip.decompress(raw)
+    return raw
+
+# --- 7. Parser le timestamp depuis le nom du fichier ---
+_TS_RE = re.compile(r'_(\d{8})_(\d{6})')
+
 def parse_timestamp_from_filename(filename: str) -> dt.datetime:
+    """
+    Extrait le timestamp d'un nom du type response_YYYYMMDD_HHMMSS_CEST.json.gz.
+    Retourne None si le nom ne correspond pas ou si la date est invalide.
+    """
+    m = _TS_RE.search(filename)
+    if m is None:
+        return None
+    d, t = m.group(1), m.group(2)
     try:
-        date_time_str = filename.split('_')[1] + '_' + filename.split('_')[2]
-        return dt.datetime.strptime(date_time_str, '%Y%m%d_%H%M%S')
-    except:
+        return dt.datetime(int(d[:4]), int(d[4:6]), int(d[6:8]), int(t[:2]), int(t[2:4]), int(t[4:6]))
+    except ValueError:
         return None
 
-# --- 7. Fonction d'insertion dans la base de données ---
-def insert_snapshot_and_get_id(cursor, timestamp: dt.datetime):
+# --- 8. Buffers du batch courant et chargement via COPY ---
+snapshot_buffer = []  # (timestamp, etat_rows, loc_rows) par fichier, en attente de snapshot_id
+station_buffer = []
+velo_buffer = []
+etat_station_buffer = []
+localisation_velo_buffer = []
+
+# (table, colonnes, clause ON CONFLICT, buffer) — l'ordre respecte les clés étrangères
+BULK_TABLES = (
+    ("station", "station_code, name, latitude, longitude, stationtype, type",
+     "ON CONFLICT (station_code) DO NOTHING", station_buffer),
+    ("velo", "velo_name, bikeelectric",
+     "ON CONFLICT (velo_name) DO NOTHING", velo_buffer),
+    ("etat_station", "snapshot_id, timestamp_capture, station_code, state, nbbike, nbebike, nbfreedock",
+     "ON CONFLICT DO NOTHING", etat_station_buffer),
+    ("localisation_velo", "snapshot_id, velo_name, station_code, bikestatus, dockposition",
+     "ON CONFLICT DO NOTHING", localisation_velo_buffer),
+)
+
+# Clés déjà présentes en base (ou dans le batch courant) : inutile de les renvoyer
+_seen_stations: set[str] = set()
+_seen_velos: set[str] = set()
+
+# Clés ajoutées aux ensembles ci-dessus par le batch en cours : retirées si le batch
+# est annulé (les buffers sont déjà vidés table par table pendant le flush)
+_batch_stations: set[str] = set()
+_batch_velos: set[str] = set()
+
+def load_seen_keys(cursor):
     """
-    Insère un snapshot et retourne son ID.
+    Précharge les station_code et velo_name déjà présents en base.
     """
-    try:
-        cursor.execute(
-            """
-            INSERT INTO snapshot (timestamp_capture)
-            VALUES (%s)
-            ON CONFLICT (timestamp_capture) DO UPDATE SET timestamp_capture = EXCLUDED.timestamp_capture
-            RETURNING snapshot_id;
-            """,
-            (timestamp,)
-        )
-        return cursor.fetchone()[0]
-    except Exception as e:
-        cursor.connection.rollback()
-        logging.error(f"Error inserting snapshot: {e}")
-        return None
+    cursor.execute("SELECT station_code FROM station;")
+    _seen_stations.update(row[0] for row in cursor.fetchall())
+    cursor.execute("SELECT velo_name FROM velo;")
+    _seen_velos.update(row[0] for row in cursor.fetchall())
+    cursor.connection.commit()
 
-def process_file_content(filename, content, timestamp, cursor, errors):
+def create_staging_tables(cursor):
+    """
+    Crée les tables temporaires de staging (une par table cible).
+    Elles sont vidées automatiquement à chaque commit.
     """
-    Traite le contenu d'un fichier JSON et l'insère dans la base de données.
+    for table, columns, _, _ in BULK_TABLES:
+        cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS staging_{table}
+            ON COMMIT DELETE ROWS
+            AS SELECT {columns} FROM {table} WITH NO DATA;
+        """)
+    cursor.connection.commit()
+
+# Marqueur NULL explicite pour COPY : en CSV, csv.writer écrit None et '' de la même
+# façon (champ vide), que COPY lirait tous deux comme NULL. Avec NULL '\N', un champ
+# vide reste une chaîne vide, comme avec l'ancien INSERT.
+_COPY_NULL = "\\N"
+
+def copy_rows(cursor, table, columns, rows):
     """
-    snapshot_id = insert_snapshot_and_get_id(cursor, timestamp)
-    if snapshot_id is None:
-        errors['snapshot_error'] += 1
-        return
+    Envoie les lignes dans `table` via COPY FROM STDIN (format CSV).
+    """
+    sio = io.StringIO()
+    csv.writer(sio, lineterminator="\n").writerows(
+        [_COPY_NULL if value is None else value for value in row] for row in rows
+    )
+    sio.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{_COPY_NULL}')", sio
+    )
 
-    try:
-        data = json.loads(content)
-        if not isinstance(data, list):
-            errors['invalid_format'] += 1
-            return
+def flush_buffers(cursor):
+    """
+    Charge les buffers dans les tables de staging puis les fusionne
+    dans les tables définitives (INSERT ... SELECT ... ON CONFLICT).
+    Le commit est laissé à l'appelant.
+    """
+    if snapshot_buffer:
+        # Un seul aller-retour pour tous les snapshots du batch (dédoublonnés, ordre conservé)
+        id_map = insert_snapshots(cursor, list(dict.fromkeys(ts for ts, _, _ in snapshot_buffer)))
+        for timestamp, etat_rows, loc_rows in snapshot_buffer:
+            snapshot_id = id_map[timestamp]
+            # timestamp_capture dénormalisé sur etat_station (lecture de l'état actuel sans jointure)
+            etat_station_buffer.extend((snapshot_id, timestamp) + row for row in etat_rows)
+            localisation_velo_buffer.extend((snapshot_id,) + row for row in loc_rows)
+        snapshot_buffer.clear()
+
+    for table, columns, on_conflict, buffer in BULK_TABLES:
+        if not buffer:
+            continue
+        copy_rows(cursor, f"staging_{table}", columns, buffer)
+        cursor.execute(f"""
+            INSERT INTO {table} ({columns})
+            SELECT {columns} FROM staging_{table}
+            {on_conflict};
+        """)
+        buffer.clear()
+
+def discard_buffers():
+    """
+    Vide les buffers sans les charger (après un rollback du batch).
+    Les clés du batch annulé sont retirées des ensembles déjà vus.
+    """
+    _seen_stations.difference_update(_batch_stations)
+    _seen_velos.difference_update(_batch_velos)
+    _batch_stations.clear()
+    _batch_velos.clear()
+    snapshot_buffer.clear()
+    for _, _, _, buffer in BULK_TABLES:
+        buffer.clear()
+
+def insert_snapshots(cursor, timestamps):
+    """
+    Insère tous les snapshots du batch en une seule requête.
+    Retourne le dictionnaire {timestamp_capture: snapshot_id}.
+    Les snapshots déjà présents ne sont pas réécrits (pas de tuple mort) :
+    leurs identifiants sont relus par un SELECT.
+    """
+    rows = execute_values(
+        cursor,
+        """
+        INSERT INTO snapshot (timestamp_capture)
+        VALUES %s
+        ON CONFLICT (timestamp_capture) DO NOTHING
+        RETURNING timestamp_capture, snapshot_id;
+        """,
+        [(ts,) for ts in timestamps],
+        page_size=len(timestamps),
+        fetch=True
+    )
+    id_map = dict(rows)
 
-        station_buffer = []
-        velo_buffer = []
-        etat_station_buffer = []
-        localisation_velo_buffer = []
+    missing = [ts for ts in timestamps if ts not in id_map]
+    if missing:
+        cursor.execute(
+            "SELECT timestamp_capture, snapshot_id FROM snapshot WHERE timestamp_capture = ANY(%s);",
+            (missing,)
+        )
+        id_map.update(cursor.fetchall())
+    return id_map
 
-        for station_data in data:
-            station_info = station_data.get('station', {})
-            station_code = station_info.get('code')
-            if not station_code:
-                continue
+# Dictionnaire vide partagé, évite d'allouer un {} par .get() manquant (ne jamais le modifier)
+_EMPTY: dict = {}
+
+# Extraction des champs d'un vélo en un seul appel C (cas nominal : toutes les clés présentes)
+_get_bike = itemgetter('bikeName', 'bikeElectric', 'bikeStatus', 'dockPosition')
 
-            station_buffer.append((
-                station_code,
-                station_info.get('name'),
-                station_info.get('gps', {}).get('latitude'),
-                station_info.get('gps', {}).get('longitude'),
-                station_info.get('stationType'),
-                station_info.get('type')
-            ))
-
-            etat_station_buffer.append((
-                snapshot_id,
-                station_code,
-                station_data.get('state'),
-                station_data.get('nbBike'),
-                station_data.get('nbEbike'),
-                station_data.get('nbFreeDock')
-            ))
-
-            for bike in station_data.get('bikes', []):
+class InvalidFormatError(ValueError):
+    """
+    Le fichier ne contient pas une liste de stations.
+    """
+
+def parse_file(filepath):
+    """
+    Lit, décompresse et parse un fichier de snapshot.
+    Fonction pure (aucun accès base) exécutée dans les process du pool.
+    Retourne (timestamp, station_rows, velo_rows, etat_rows, loc_rows) ;
+    les lignes d'état et de localisation n'ont pas encore de snapshot_id.
+    """
+    timestamp = parse_timestamp_from_filename(os.path.basename(filepath))
+    data = orjson.loads(read_file_bytes(filepath))
+    if not isinstance(data, list):
+        raise InvalidFormatError(f"expected a list, got {type(data).__name__}")
+
+    station_rows = []
+    velo_rows = []
+    etat_rows = []
+    loc_rows = []
+
+    # Méthodes liées une seule fois : la boucle est exécutée ~1400 fois par fichier
+    station_rows_append = station_rows.append
+    velo_rows_append = velo_rows.append
+    etat_rows_append = etat_rows.append
+    loc_rows_append = loc_rows.append
+
+    for station_data in data:
+        station_info = station_data.get('station') or _EMPTY
+        station_code = station_info.get('code')
+        if not station_code:
+            continue
+
+        gps = station_info.get('gps') or _EMPTY
+        station_rows_append((
+            station_code,
+            station_info.get('name'),
+            gps.get('latitude'),
+            gps.get('longitude'),
+            station_info.get('stationType'),
+            station_info.get('type')
+        ))
+
+        etat_rows_append((
+            station_code,
+            station_data.get('state'),
+            station_data.get('nbBike'),
+            station_data.get('nbEbike'),
+            station_data.get('nbFreeDock')
+        ))
+
+        for bike in station_data.get('bikes') or ():
+            try:
+                velo_name, electric, status, dock = _get_bike(bike)
+            except KeyError:
                 velo_name = bike.get('bikeName')
-                if not velo_name:
-                    continue
-
-                velo_buffer.append((velo_name, bike.get('bikeElectric')))
-                localisation_velo_buffer.append((
-                    snapshot_id,
-                    velo_name,
-                    station_code,
-                    bike.get('bikeStatus'),
-                    bike.get('dockPosition')
-                ))
-
-        # Insertion des données dans la base de données
-        if station_buffer:
-            execute_values(cursor, """
-                INSERT INTO station (station_code, name, latitude, longitude, stationtype, type)
-                VALUES %s
-                ON CONFLICT (station_code) DO NOTHING
-            """, station_buffer)
-
-        if velo_buffer:
-            execute_values(cursor, """
-                INSERT INTO velo (velo_name, bikeelectric)
-                VALUES %s
-                ON CONFLICT (velo_name) DO NOTHING
-            """, velo_buffer)
-
-        if etat_station_buffer:
-            execute_values(cursor, """
-                INSERT INTO etat_station (snapshot_id, station_code, state, nbbike, nbebike, nbfreedock)
-                VALUES %s
-                ON CONFLICT DO NOTHING
-            """, etat_station_buffer)
-
-        if localisation_velo_buffer:
-            execute_values(cursor, """
-                INSERT INTO localisation_velo (snapshot_id, velo_name, station_code, bikestatus, dockposition)
-                VALUES %s
-                ON CONFLICT DO NOTHING
-            """, localisation_velo_buffer)
+                electric = bike.get('bikeElectric')
+                status = bike.get('bikeStatus')
+                dock = bike.get('dockPosition')
+            if not velo_name:
+                continue
 
-        cursor.connection.commit()
+            velo_rows_append((velo_name, electric))
+            loc_rows_append((velo_name, station_code, status, dock))
 
+    return timestamp, station_rows, velo_rows, etat_rows, loc_rows
+
+def parse_file_safe(filepath):
+    """
+    Enveloppe de parse_file pour le pool : une exception ne doit pas
+    interrompre la consommation des résultats.
+    Retourne (résultat, None) ou (None, (type_erreur, message)).
+    """
+    try:
+        return parse_file(filepath), None
+    except (OSError, EOFError) as e:
+        return None, ('read', str(e))
+    except InvalidFormatError as e:
+        return None, ('invalid_format', str(e))
     except Exception as e:
-        cursor.connection.rollback()
-        logging.error(f"Processing error {filename}: {e}")
-        errors['generic_error'] += 1
+        return None, ('processing', f"{type(e).__name__}: {e}")
+
+def parse_files_in_order(executor, filepaths, max_pending):
+    """
+    Soumet les fichiers au pool et restitue les résultats dans l'ordre,
+    avec au plus `max_pending` fichiers en vol pour borner la mémoire.
+    """
+    pending = deque()
+    for filepath in filepaths:
+        pending.append(executor.submit(parse_file_safe, filepath))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def buffer_parsed_file(parsed):
+    """
+    Ajoute les lignes d'un fichier parsé aux buffers du batch courant.
+    Les snapshot_id sont attribués au moment du flush.
+    """
+    timestamp, station_rows, velo_rows, etat_rows, loc_rows = parsed
+
+    for row in station_rows:
+        if row[0] not in _seen_stations:
+            _seen_stations.add(row[0])
+            _batch_stations.add(row[0])
+            station_buffer.append(row)
+    for row in velo_rows:
+        if row[0] not in _seen_velos:
+            _seen_velos.add(row[0])
+            _batch_velos.add(row[0])
+            velo_buffer.append(row)
+    snapshot_buffer.append((timestamp, etat_rows, loc_rows))
+
+def commit_batch(cursor, progress, batch_files, errors, durable=True):
+    """
+    Charge le batch courant et le valide en une seule transaction.
+    Retourne le nombre de fichiers validés (0 si le batch a échoué).
+    La sauvegarde de progress.json est laissée à l'appelant.
 
-# --- 8. Fonction principale pour l'importation des données ---
+    Si `durable` est faux, le commit n'attend pas l'écriture du WAL sur disque
+    (synchronous_commit = off). Un commit durable rend aussi durables tous
+    les commits asynchrones qui le précèdent.
+    """
+    committed = 0
+    try:
+        if not durable:
+            cursor.execute("SET LOCAL synchronous_commit = off;")
+        flush_buffers(cursor)
+        cursor.connection.commit()
+    except psycopg2.Error as e:
+        cursor.connection.rollback()
+        discard_buffers()
+        logging.error(f"Batch error ({len(batch_files)} files): {e}")
+        errors['batch_error'] += 1
+    else:
+        # Clés du batch désormais en base
+        _batch_stations.clear()
+        _batch_velos.clear()
+        progress["done"].update(batch_files)
+        committed = len(batch_files)
+    batch_files.clear()
+    return committed
+
+# --- 9. Fonction principale pour l'importation des données ---
 def import_data_from_folder(data_folder):
     """
     Processus d'importation des fichiers dans le dossier.
     """
     progress = load_progress()
-    done_files = set(progress["done"])
+    progress["done"] = set(progress["done"])
+    done_files = progress["done"]
 
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    all_files = [f for f in os.listdir(data_folder) if f.endswith(('.json', '.gz'))]
-    remaining_files = [f for f in all_files if f not in done_files]
-
-    errors = {'invalid_format': 0, 'snapshot_error': 0, 'generic_error': 0}
-
-    with tqdm(total=len(all_files), desc="Processing", ncols=100) as pbar:
+    # Un seul parcours du dossier : comptage pour tqdm + fichiers restants
+    total_files = 0
+    remaining_files = []
+    for filename in iter_data_files(data_folder):
+        total_files += 1
+        if filename not in done_files:
+            remaining_files.append(filename)
+    # Ordre chronologique (le nom contient le timestamp) : snapshot_id croissants dans le temps
+    remaining_files.sort()
+    already_done = total_files - len(remaining_files)
+
+    errors = {'invalid_format': 0, 'generic_error': 0, 'batch_error': 0}
+    batch_files = []
+
+    # Fichiers validés par un commit asynchrone, pas encore couverts par un commit durable :
+    # jamais écrits dans progress.json (ils seraient perdus en cas de crash du serveur)
+    async_files = []
+    last_save = time.monotonic()
+
+    def commit_and_checkpoint(final=False):
+        nonlocal last_save
+        # Seul le batch suivi d'une sauvegarde de progress.json est validé de façon durable
+        # (ce qui rend durables les commits asynchrones qui le précèdent) :
+        # un fichier n'est jamais marqué traité avant que ses lignes soient sur disque.
+        save_due = (
+            final
+            or len(async_files) + len(batch_files) >= PROGRESS_SAVE_EVERY
+            or time.monotonic() - last_save > PROGRESS_SAVE_INTERVAL
+        )
+        files = list(batch_files)
+        if not commit_batch(cursor, progress, batch_files, errors, durable=save_due):
+            return
+        if save_due:
+            async_files.clear()
+            save_progress(progress)
+            last_save = time.monotonic()
+        else:
+            async_files.extend(files)
 
-        pbar.update(len(done_files))
+    try:
+        create_staging_tables(cursor)
+        load_seen_keys(cursor)
 
-        for filename in remaining_files:
-            filepath = os.path.join(data_folder, filename)
-            timestamp = parse_timestamp_from_filename(filename)
+        with tqdm(total=total_files, desc="Processing", ncols=100, mininterval=0.5, smoothing=0) as pbar, \
+                ProcessPoolExecutor(max_workers=PARSE_WORKERS) as executor:
 
-            if timestamp is None:
-                errors['generic_error'] += 1
-                progress["done"].append(filename)
-                save_progress(progress)
-                pbar.update(1)
-                continue
+            pbar.update(already_done)
 
-            try:
-                # Lecture du fichier
-                if filename.endswith('.gz'):
-                    with gzip.open(filepath, 'rt', encoding='utf-8') as f:
-                        content = f.read()
+            to_parse = []
+            for filename in remaining_files:
+                if parse_timestamp_from_filename(filename) is None:
+                    errors['generic_error'] += 1
+                    batch_files.append(filename)
                 else:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
-                process_file_content(filename, content, timestamp, cursor, errors)
-
-                # Sauvegarde de la progression
-                progress["done"].append(filename)
-                save_progress(progress)
-
-            except Exception as e:
-                logging.error(f"Failed to read {filename}: {e}")
-                errors['generic_error'] += 1
-
-            pbar.set_postfix(errors=errors, refresh=True)
-            pbar.update(1)
-
-    cursor.close()
-    conn.close()
+                    to_parse.append(filename)
+            pbar.update(len(remaining_files) - len(to_parse))
+
+            # Parsing en parallèle, écriture en base dans ce seul process
+            results = parse_files_in_order(
+                executor,
+                (os.path.join(data_folder, filename) for filename in to_parse),
+                max_pending=PARSE_WORKERS * 4
+            )
+
+            for i, (filename, (parsed, error)) in enumerate(zip(to_parse, results), 1):
+                if error is not None:
+                    kind, message = error
+                    if kind == 'read':
+                        # Fichier illisible : non marqué comme traité, il sera retenté
+                        logging.error(f"Failed to read {filename}: {message}")
+                        errors['generic_error'] += 1
+                    elif kind == 'invalid_format':
+                        errors['invalid_format'] += 1
+                        batch_files.append(filename)
+                    else:
+                        logging.error(f"Processing error {filename}: {message}")
+                        errors['generic_error'] += 1
+                        batch_files.append(filename)
+                else:
+                    buffer_parsed_file(parsed)
+                    batch_files.append(filename)
+
+                if len(batch_files) >= BATCH_SIZE:
+                    # Dernier fichier : ce batch est le dernier, il doit être durable
+                    commit_and_checkpoint(final=(i == len(to_parse)))
+
+                # Rafraîchissement groupé : formater la barre à chaque fichier coûte cher
+                if i % PBAR_UPDATE_EVERY == 0:
+                    pbar.set_postfix(errors=errors, refresh=False)
+                    pbar.update(PBAR_UPDATE_EVERY)
+
+            pbar.set_postfix(errors=errors, refresh=False)
+            pbar.update(len(to_parse) % PBAR_UPDATE_EVERY)
+
+            # Dernier batch incomplet
+            if batch_files:
+                commit_and_checkpoint(final=True)
+
+    finally:
+        # Chaque commit durable a déjà sauvegardé progress.json. Les fichiers des derniers
+        # commits asynchrones n'y figurent pas : ils seront retraités (insertions idempotentes).
+        cursor.close()
+        conn.close()
 
 if __name__ == '__main__':
     import_data_from_folder(DATA_FOLDER)
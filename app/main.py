@@ -1,9 +1,11 @@
-from fastapi import FastAPI, Depends, HTTPException, APIRouter, Query, status, Header
+from fastapi import FastAPI, Depends, HTTPException, APIRouter, Query, status, Header, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from typing import List, Optional
+from typing import List, Optional, Literal
 import datetime as dt
 import os
+import asyncio
+import logging
 from dotenv import load_dotenv
 
 # Importez vos modèles Pydantic et la configuration DB/App
@@ -11,14 +13,38 @@ from dotenv import load_dotenv
 from models import (
     StationBase, VeloBase, StationRead, VeloRead, EtatStation, 
     LocalisationVeloRead, Trajet, TrajetStats, TrajetsByDayStats, 
-    StationTraffic, StationFlowImbalance, TopVelo, AverageRouteStats,VeloStationsCount
+    StationTraffic, StationFlowImbalance, TopVelo, AverageRouteStats,VeloStationsCount,
+    DashboardOverview
+)
+from database import get_db, app, engine, AsyncSessionLocal, VelibJSONResponse, dumps_json # get_db fournit l'AsyncSession
+from cache import cached, bump_generation
+from queries import (
+    STMTS_STATIONS, STMTS_VELOS,
+    STMT_STATION_BY_CODE, STMT_STATION_UPSERT, STMT_STATION_BULK_UPSERT, STMT_STATION_UPDATE,
+    STMT_STATION_DELETE, STMT_VELO_INSERT, STMT_VELO_UPDATE, STMT_VELO_DELETE,
+    STMT_STATION_CURRENT_STATE, SQL_RECENT_LOCS, SQL_RECENT_LOCS_AFTER, STMT_LOCATION_DELETE,
+    SQL_TRAJETS_PAGE, SQL_TRAJETS_PAGE_AFTER, SQL_TRAJETS_PAGE_AFTER_VELO, STMT_TRAJETS_STREAM,
+    STMT_TRAJETS_BY_VELO, STMTS_VELO_STATIONS_COUNT, STMT_BOOMERANG_EXISTS, STMT_BOOMERANG_COUNT,
+    STMTS_TOP_ROUTES, STMTS_TRAJETS_BY_DAY, STMTS_FLOW_IMBALANCE,
+    STMT_TOP_SOURCE_DESTINATION, STMT_TOP_USED_VELOS, STMT_AVERAGE_BY_ROUTE,
+    STMT_MV_REFRESH_LOCK, STMTS_MV_REFRESH
 )
-from database import get_db, app # get_db fournit l'AsyncSession
 
 # --- Configuration de Sécurité ---
 load_dotenv()
 API_KEY_SECRET = os.getenv("API_KEY_SECRET")
 
+# Intervalle de rafraîchissement des vues matérialisées d'analyse (secondes)
+MV_REFRESH_SECONDS = int(os.getenv("MV_REFRESH_SECONDS", "300"))
+
+# Durée de vie (secondes) des résultats d'analyse en cache
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "60"))
+
+# Taille de liste à partir de laquelle la sérialisation JSON est déportée dans un thread
+SERIALIZE_IN_THREAD_ROWS = int(os.getenv("SERIALIZE_IN_THREAD_ROWS", "200"))
+
+logger = logging.getLogger(__name__)
+
 # Dépendance pour l'authentification par Clé API
 def api_key_auth(api_key: str = Header(..., alias="X-API-Key")):
     """
@@ -32,6 +58,39 @@ def api_key_auth(api_key: str = Header(..., alias="X-API-Key")):
     return api_key
 
 
+# Construction des réponses (listes ou ligne unique) sans validation Pydantic ligne par ligne :
+# les lignes proviennent de nos propres SELECT (données de confiance).
+def rows_to(model, rows):
+    mc = model.model_construct
+    return [mc(**r._mapping) for r in rows]
+
+def row_to(model, row):
+    return model.model_construct(**row._mapping)
+
+# Pour les grosses listes : sérialisation directe des lignes par orjson,
+# sans passer par les modèles Pydantic (response_model ne sert qu'à la doc OpenAPI).
+# Au-delà de SERIALIZE_IN_THREAD_ROWS lignes, la conversion et la sérialisation
+# tournent dans un thread pour ne pas bloquer la boucle d'événements.
+async def json_response(items, to_dict, headers=None):
+    if len(items) <= SERIALIZE_IN_THREAD_ROWS:
+        return VelibJSONResponse([to_dict(r) for r in items], headers=headers)
+    body = await asyncio.to_thread(lambda: dumps_json([to_dict(r) for r in items]))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def rows_json(rows):
+    return await json_response(rows, lambda r: dict(r._mapping))
+
+# Lecture seule sur les endpoints les plus sollicités : requête exécutée directement
+# par asyncpg, sans construction des Row SQLAlchemy. Retourne des asyncpg.Record.
+async def fetch_raw(db: AsyncSession, sql: str, *args):
+    conn = await db.connection()
+    raw = await conn.get_raw_connection()
+    return await raw.driver_connection.fetch(sql, *args)
+
+async def records_json(records, headers=None):
+    return await json_response(records, dict, headers)
+
+
 # DÉFINITION UNIQUE ET PROPRE DES ROUTERS
 router_dims = APIRouter(prefix="/api/v1/dimensions", tags=["Dimensions (CRUD)"])
 router_facts = APIRouter(prefix="/api/v1/facts", tags=["Faits (Lecture/Analyse)"])
@@ -48,29 +107,26 @@ router_analysis = APIRouter(prefix="/api/v1/analysis", tags=["Analyse (V_TRAJETS
 @router_dims.get("/stations", response_model=List[StationRead], summary="Liste de toutes les stations (avec filtre optionnel par type)")
 async def read_all_stations(
     db: AsyncSession = Depends(get_db),
-    station_type: Optional[str] = Query(None, description="Filtrer par type de station (ex: 'STANDARD' ou 'PLUS')")
+    station_type: Optional[str] = Query(None, description="Filtrer par type de station (ex: 'STANDARD' ou 'PLUS')"),
+    fields: Literal["full", "basic"] = Query("full", description="'basic' : uniquement les champs de StationBase (sans nbdock_total ni maxbikeoverflow)")
 ):
-    sql_query = "SELECT * FROM station"
-    params = {}
-    
-    if station_type:
-        sql_query += " WHERE type = :st_type"
-        params["st_type"] = station_type
-        
-    sql_query += " ORDER BY station_code"
-        
-    result = await db.execute(text(sql_query), params)
+    basic = fields == "basic"
+    sql_query = STMTS_STATIONS[(bool(station_type), basic)]
+    result = await db.execute(sql_query, {"st_type": station_type} if station_type else {})
     rows = result.all()
-    return [StationRead.model_validate(row, from_attributes=True) for row in rows]
+    if basic:
+        # Lignes renvoyées telles quelles : les champs absents ne sont pas émis à null
+        return await rows_json(rows)
+    return rows_to(StationRead, rows)
 
 
 @router_dims.get("/stations/{code}", response_model=StationRead, summary="Détails d'une station par code")
 async def read_station(code: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(text("SELECT * FROM station WHERE station_code = :code"), {"code": code})
+    result = await db.execute(STMT_STATION_BY_CODE, {"code": code})
     row = result.first()
     if row is None:
         raise HTTPException(status_code=404, detail="Station not found")
-    return StationRead.model_validate(row, from_attributes=True)
+    return row_to(StationRead, row)
 
 
 @router_dims.post("/stations", 
@@ -79,33 +135,35 @@ async def read_station(code: str, db: AsyncSession = Depends(get_db)):
                   dependencies=[Depends(api_key_auth)]) # SÉCURISÉ
 async def create_station(station: StationBase, db: AsyncSession = Depends(get_db)):
     try:
-        await db.execute(
-            text("""
-                INSERT INTO station (station_code, name, latitude, longitude, type)
-                VALUES (:station_code, :name, :latitude, :longitude, :type)
-                ON CONFLICT (station_code) DO UPDATE 
-                SET name = EXCLUDED.name, latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude, type = EXCLUDED.type
-                RETURNING station_code;
-            """),
-            station.model_dump()
-        )
+        await db.execute(STMT_STATION_UPSERT, station.model_dump())
         await db.commit()
+        bump_generation()
         return {"message": f"Station {station.station_code} created or updated"}
     except Exception as e:
-        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
 
 
-@router_dims.delete("/stations/{code}", 
-                    status_code=status.HTTP_204_NO_CONTENT, 
-                    summary="Supprimer une station",
-                    dependencies=[Depends(api_key_auth)]) # SÉCURISÉ
-async def delete_station(code: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(text("DELETE FROM station WHERE station_code = :code RETURNING station_code;"), {"code": code})
-    if result.rowcount == 0:
-        raise HTTPException(status_code=404, detail="Station not found")
-    await db.commit()
-    return
+@router_dims.post("/stations/bulk", 
+                  status_code=status.HTTP_201_CREATED, 
+                  summary="Créer/Mettre à jour des stations en masse (UPSERT)",
+                  dependencies=[Depends(api_key_auth)]) # SÉCURISÉ
+async def create_stations_bulk(stations: List[StationBase], db: AsyncSession = Depends(get_db)):
+    # Un même code ne peut pas être mis à jour deux fois par le même INSERT : la dernière occurrence l'emporte
+    by_code = {station.station_code: station for station in stations}
+    try:
+        await db.execute(STMT_STATION_BULK_UPSERT, {
+            "station_codes": list(by_code),
+            "names": [st.name for st in by_code.values()],
+            "latitudes": [st.latitude for st in by_code.values()],
+            "longitudes": [st.longitude for st in by_code.values()],
+            "types": [st.type for st in by_code.values()],
+        })
+        await db.commit()
+        bump_generation()
+        return {"message": f"{len(by_code)} stations created or updated"}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
 
 # ----- VELO CRUD & LECTURE AVEC FILTRE -----
 
@@ -115,24 +173,19 @@ async def read_all_velos(
     is_electric: Optional[bool] = Query(None, alias="electric", description="Filtrer par vélo électrique"),
     search: Optional[str] = Query(None, description="Rechercher par nom (partiel)")
 ):
-    conditions = []
     params = {}
     
     if is_electric is not None:
-        conditions.append("bikeelectric = :is_electric")
         params['is_electric'] = is_electric
         
     if search:
-        conditions.append("velo_name ILIKE :search_term")
         params['search_term'] = f"%{search}%"
         
-    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
-    
-    sql_query = text(f"SELECT * FROM velo {where_clause} ORDER BY velo_name")
+    sql_query = STMTS_VELOS[(is_electric is not None, bool(search))]
     
     result = await db.execute(sql_query, params)
     rows = result.all()
-    return [VeloRead.model_validate(row, from_attributes=True) for row in rows]
+    return rows_to(VeloRead, rows)
 
 
 @router_dims.post("/velos", 
@@ -141,18 +194,11 @@ async def read_all_velos(
                   dependencies=[Depends(api_key_auth)]) # SÉCURISÉ
 async def create_velo(velo: VeloBase, db: AsyncSession = Depends(get_db)):
     try:
-        await db.execute(
-            text("""
-                INSERT INTO velo (velo_name, bikeelectric)
-                VALUES (:velo_name, :bikeelectric)
-                ON CONFLICT (velo_name) DO NOTHING;
-            """),
-            velo.model_dump()
-        )
+        await db.execute(STMT_VELO_INSERT, velo.model_dump())
         await db.commit()
+        bump_generation()
         return {"message": f"Velo {velo.velo_name} created or ignored"}
     except Exception as e:
-        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
     
 
@@ -167,18 +213,9 @@ async def update_station(
     db: AsyncSession = Depends(get_db)
 ):
     try:
-        # Vérification si la station existe
-        check_result = await db.execute(text("SELECT station_code FROM station WHERE station_code = :code"), {"code": code})
-        if check_result.first() is None:
-            raise HTTPException(status_code=404, detail=f"Station code {code} not found")
-
-        # Mise à jour des données
-        await db.execute(
-            text("""
-                UPDATE station
-                SET name = :name, latitude = :latitude, longitude = :longitude, type = :type
-                WHERE station_code = :code;
-            """),
+        # Mise à jour et relecture en un seul aller-retour (RETURNING)
+        result = await db.execute(
+            STMT_STATION_UPDATE,
             {
                 "code": code,
                 "name": station.name,
@@ -187,11 +224,13 @@ async def update_station(
                 "type": station.type
             }
         )
-        await db.commit()
-        
-        # Récupération de l'objet mis à jour pour le renvoyer
-        result = await db.execute(text("SELECT * FROM station WHERE station_code = :code"), {"code": code})
         updated_row = result.first()
+
+        if updated_row is None:
+            raise HTTPException(status_code=404, detail=f"Station code {code} not found")
+
+        await db.commit()
+        bump_generation()
         
         return StationRead.model_validate(updated_row, from_attributes=True)
     
@@ -199,7 +238,6 @@ async def update_station(
         # Relance l'exception 404 si elle a été levée
         raise
     except Exception as e:
-        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error during update: {e}")
     
 
@@ -217,12 +255,7 @@ async def update_velo(
     try:
         # La mise à jour est simple car la seule colonne modifiable est bikeelectric
         result = await db.execute(
-            text("""
-                UPDATE velo
-                SET bikeelectric = :bikeelectric
-                WHERE velo_name = :vn
-                RETURNING *; -- Retourne la ligne mise à jour
-            """),
+            STMT_VELO_UPDATE,
             {
                 "vn": velo_name,
                 "bikeelectric": velo.bikeelectric
@@ -234,13 +267,13 @@ async def update_velo(
             raise HTTPException(status_code=404, detail=f"Velo {velo_name} not found")
 
         await db.commit()
+        bump_generation()
         
         return VeloRead.model_validate(updated_row, from_attributes=True)
         
     except HTTPException:
         raise
     except Exception as e:
-        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error during update: {e}")
 
 @router_dims.delete("/stations/{code}", 
@@ -259,17 +292,13 @@ async def delete_station(
         )
 
     # Si la confirmation est donnée, on procède à la suppression
-    result = await db.execute(text("DELETE FROM station WHERE station_code = :code RETURNING station_code;"), {"code": code})
+    result = await db.execute(STMT_STATION_DELETE, {"code": code})
     
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Station not found")
-        
-    try:
-        await db.commit()
-    except Exception as e:
-        await db.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error during deletion: {e}")
-        
+
+    await db.commit()
+    bump_generation()
     return # Réponse 204 No Content
 
 # Dans main.py, sous router_dims
@@ -299,24 +328,22 @@ async def delete_velo(
         # 2. Exécution de la Suppression
         # NOTE : Si d'autres tables (faits/trajets) ont des clés étrangères vers velo_name, 
         # cette opération échouera à moins que la DB ne gère la suppression en cascade (ON DELETE CASCADE).
-        result = await db.execute(
-            text("DELETE FROM velo WHERE velo_name = :vn RETURNING velo_name;"), 
-            {"vn": velo_name}
-        )
+        result = await db.execute(STMT_VELO_DELETE, {"vn": velo_name})
         
         # 3. Vérification du Résultat
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail=f"Velo {velo_name} not found")
             
-        # 4. Validation de la Transaction
+        # 4. Validation de la Transaction, avant la réponse
         await db.commit()
+        bump_generation()
         
     except HTTPException:
         # Permet aux exceptions 404/400 de passer
         raise
     except Exception as e:
         # Gère les erreurs de DB (ex: violation de contrainte si le vélo est utilisé ailleurs)
-        await db.rollback()
+        # Le rollback est fait par get_db à la sortie de l'exception
         # On pourrait être plus précis sur les codes d'erreur PostgreSQL ici.
         raise HTTPException(status_code=500, detail=f"Database error during deletion: {e}")
         
@@ -329,43 +356,35 @@ async def delete_velo(
 
 @router_facts.get("/stations/{station_code}/etat_actuel", response_model=EtatStation, summary="État le plus récent d'une station")
 async def read_station_current_state(station_code: str, db: AsyncSession = Depends(get_db)):
-    sql_query = text("""
-        SELECT 
-            es.station_code, 
-            s.timestamp_capture, 
-            es.nbbike, es.nbebike, es.nbfreedock, es.state
-        FROM etat_station es
-        JOIN snapshot s ON es.snapshot_id = s.snapshot_id
-        WHERE es.station_code = :code
-        ORDER BY s.timestamp_capture DESC
-        LIMIT 1;
-    """)
-    result = await db.execute(sql_query, {"code": station_code})
+    result = await db.execute(STMT_STATION_CURRENT_STATE, {"code": station_code})
     row = result.first()
     
     if row is None:
         raise HTTPException(status_code=404, detail="Station ou état non trouvé")
     
-    return EtatStation.model_validate(row, from_attributes=True)
-
-@router_facts.get("/localisations", response_model=List[LocalisationVeloRead], summary="Localisations récentes (Paginée)")
-async def read_recent_locations(db: AsyncSession = Depends(get_db), limit: int = 100, offset: int = 0):
-    sql_query = text(f"""
-        SELECT loc_id, snapshot_id, velo_name, station_code, bikestatus
-        FROM localisation_velo
-        ORDER BY loc_id DESC
-        LIMIT :limit OFFSET :offset;
-    """)
-    result = await db.execute(sql_query, {"limit": limit, "offset": offset})
-    rows = result.all()
-    return [LocalisationVeloRead.model_validate(row, from_attributes=True) for row in rows]
+    return row_to(EtatStation, row)
+
+@router_facts.get("/localisations", response_model=List[LocalisationVeloRead], summary="Localisations récentes (Paginée par curseur)")
+async def read_recent_locations(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=1000),
+    after_id: Optional[int] = Query(None, description="Curseur : loc_id du dernier élément de la page précédente (en-tête X-Next-After-Id)")
+):
+    if after_id is None:
+        records = await fetch_raw(db, SQL_RECENT_LOCS, limit)
+    else:
+        records = await fetch_raw(db, SQL_RECENT_LOCS_AFTER, limit, after_id)
+
+    # Curseur de la page suivante, absent sur la dernière page
+    headers = {"X-Next-After-Id": str(records[-1]["loc_id"])} if len(records) == limit else None
+    return await records_json(records, headers)
 
 @router_facts.delete("/localisations/{loc_id}", 
                      status_code=status.HTTP_204_NO_CONTENT, 
                      summary="Supprime une ligne de localisation par ID",
                      dependencies=[Depends(api_key_auth)]) # SÉCURISÉ
 async def delete_location(loc_id: int, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(text("DELETE FROM localisation_velo WHERE loc_id = :id RETURNING loc_id;"), {"id": loc_id})
+    result = await db.execute(STMT_LOCATION_DELETE, {"id": loc_id})
     if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Location ID not found")
     await db.commit()
@@ -376,22 +395,42 @@ async def delete_location(loc_id: int, db: AsyncSession = Depends(get_db)):
 # (Lecture asynchrone, Path Parameter)
 # =================================================================
 
-@router_analysis.get("/trajets", response_model=List[Trajet], summary="Liste des trajets inférés (PAGINÉE)")
+@router_analysis.get("/trajets", response_model=List[Trajet], summary="Liste des trajets inférés (PAGINÉE par curseur)")
 async def read_trajets(
     db: AsyncSession = Depends(get_db),
     limit: int = Query(100, ge=1, le=1000),
-    offset: int = Query(0, ge=0)
+    after: Optional[dt.datetime] = Query(None, description="Curseur : heure_depart du dernier trajet de la page précédente (en-tête X-Next-After)"),
+    after_velo: Optional[str] = Query(None, description="Curseur : velo_name du dernier trajet de la page précédente (en-tête X-Next-After-Velo)")
 ):
-    sql_query = text(f"""
-        SELECT velo_name, station_depart_code, heure_depart, station_arrivee_code, heure_arrivee, duree_trajet_minutes
-        FROM V_TRAJETS
-        ORDER BY heure_depart DESC
-        LIMIT :limit OFFSET :offset;
-    """)
-    
-    result = await db.execute(sql_query, {"limit": limit, "offset": offset})
-    rows = result.all()
-    return [Trajet.model_validate(row, from_attributes=True) for row in rows]
+    if after is None:
+        records = await fetch_raw(db, SQL_TRAJETS_PAGE, limit)
+    elif after_velo is None:
+        records = await fetch_raw(db, SQL_TRAJETS_PAGE_AFTER, limit, after)
+    else:
+        records = await fetch_raw(db, SQL_TRAJETS_PAGE_AFTER_VELO, limit, after, after_velo)
+
+    # Curseur de la page suivante, absent sur la dernière page
+    headers = None
+    if len(records) == limit:
+        last = records[-1]
+        headers = {"X-Next-After": last["heure_depart"].isoformat(), "X-Next-After-Velo": last["velo_name"]}
+    return await records_json(records, headers)
+
+
+# Lignes lues par paquets via un curseur serveur : mémoire constante quelle que soit la taille de l'export
+STREAM_BATCH_ROWS = 500
+
+async def stream_trajets_ndjson():
+    # Session propre au flux : il se poursuit après la fin du handler
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(STMT_TRAJETS_STREAM, execution_options={"yield_per": STREAM_BATCH_ROWS})
+        async for rows in result.partitions():
+            yield b"".join(dumps_json(dict(r._mapping)) + b"\n" for r in rows)
+
+
+@router_analysis.get("/trajets/stream", summary="Export de tous les trajets inférés (NDJSON en flux)")
+async def stream_trajets():
+    return StreamingResponse(stream_trajets_ndjson(), media_type="application/x-ndjson")
 
 
 @router_analysis.get("/trajets/velo/{velo_name}", response_model=List[Trajet], summary="Liste des trajets d'un vélo spécifique")
@@ -401,59 +440,28 @@ async def read_trajets_by_velo(
     limit: int = Query(100, ge=1, le=1000),
     offset: int = Query(0, ge=0)
 ):
-    sql_query = text(f"""
-        SELECT velo_name, station_depart_code, heure_depart, station_arrivee_code, heure_arrivee, duree_trajet_minutes
-        FROM V_TRAJETS
-        WHERE velo_name = :velo_name
-        ORDER BY heure_depart DESC
-        LIMIT :limit OFFSET :offset;
-    """)
-    
     params = {"velo_name": velo_name, "limit": limit, "offset": offset}
-    result = await db.execute(sql_query, params)
+    result = await db.execute(STMT_TRAJETS_BY_VELO, params)
     rows = result.all()
-    return [Trajet.model_validate(row, from_attributes=True) for row in rows]
+    return await rows_json(rows)
 
 
 
 
 @router_analysis.get("/trajets/top_routes", response_model=List[TrajetStats], summary="Top 10 des trajets les plus populaires (filtrable temporellement)")
+@cached(ttl=ANALYSIS_CACHE_TTL)
 async def get_top_routes(
     db: AsyncSession = Depends(get_db),
     limit: int = Query(10, ge=1, le=100),
     start_date: Optional[dt.date] = Query(None, description="Date de début (YYYY-MM-DD)"),
     end_date: Optional[dt.date] = Query(None, description="Date de fin (YYYY-MM-DD)")
 ):
-    where_clause = []
-    params = {"limit": limit}
-    
-    if start_date:
-        where_clause.append("heure_depart >= :start_date")
-        params['start_date'] = start_date
-        
-    if end_date:
-        # Ajout d'une journée pour inclure toute la journée de fin
-        where_clause.append("heure_depart < :end_date + INTERVAL '1 day'")
-        params['end_date'] = end_date
-        
-    where_sql = f"WHERE {' AND '.join(where_clause)}" if where_clause else ""
-
-    sql_query = text(f"""
-        SELECT 
-            station_depart_code,
-            station_arrivee_code,
-            COUNT(*) AS nombre_trajets,
-            AVG(duree_trajet_minutes) AS duree_moyenne_minutes
-        FROM V_TRAJETS
-        {where_sql}
-        GROUP BY 1, 2
-        ORDER BY nombre_trajets DESC
-        LIMIT :limit;
-    """)
+    sql_query = STMTS_TOP_ROUTES[(start_date is not None, end_date is not None)]
+    params = {"limit": limit, "start_date": start_date, "end_date": end_date}
     
     result = await db.execute(sql_query, params)
     rows = result.all()
-    return [TrajetStats.model_validate(row, from_attributes=True) for row in rows]
+    return rows_to(TrajetStats, rows)
 
 
 
@@ -466,210 +474,131 @@ async def get_velo_stations_count(
 ):
     date_reference = date_ref if date_ref else dt.date.today()
     
-    # Mappage pour construire la clause WHERE
-    periode_map = {
-        "jour": "DATE(heure_depart) = :date_ref",
-        "semaine": "DATE(heure_depart) >= :date_ref - INTERVAL '7 days' AND DATE(heure_depart) <= :date_ref",
-        "mois": "DATE(heure_depart) >= :date_ref - INTERVAL '1 month' AND DATE(heure_depart) <= :date_ref",
-        "annee": "DATE(heure_depart) >= :date_ref - INTERVAL '1 year' AND DATE(heure_depart) <= :date_ref",
-    }
-    
-    if periode.lower() not in periode_map:
+    sql_query = STMTS_VELO_STATIONS_COUNT.get(periode.lower())
+    if sql_query is None:
         raise HTTPException(status_code=400, detail="Période invalide. Utilisez 'jour', 'semaine', 'mois', ou 'annee'.")
-        
-    where_condition = periode_map[periode.lower()]
-
-    sql_query = text(f"""
-        WITH VisitedStations AS (
-            -- On combine les stations de départ et d'arrivée, en assurant l'unicité
-            SELECT station_depart_code AS station_code FROM V_TRAJETS
-            WHERE velo_name = :vn AND {where_condition}
-            UNION
-            SELECT station_arrivee_code AS station_code FROM V_TRAJETS
-            WHERE velo_name = :vn AND {where_condition}
-        )
-        SELECT COUNT(station_code) FROM VisitedStations;
-    """)
     
     params = {"vn": velo_name, "date_ref": date_reference}
     
     count_result = await db.execute(sql_query, params)
     count_value = count_result.scalar_one()
     
-    return VeloStationsCount.model_validate({
-        "velo_name": velo_name,
-        "periode": periode.lower(),
-        "nombre_stations_visitees": count_value
-    }, from_attributes=True)
+    return VeloStationsCount.model_construct(
+        velo_name=velo_name,
+        periode=periode.lower(),
+        nombre_stations_visitees=count_value,
+    )
 
 @router_analysis.get("/velos/{velo_name}/boomerang", summary="Vérifie si un vélo a effectué un trajet boomerang")
-async def check_boomerang(velo_name: str, db: AsyncSession = Depends(get_db)):
-    sql_query = text("""
-        SELECT COUNT(*)
-        FROM V_TRAJETS
-        WHERE velo_name = :vn
-        AND station_depart_code = station_arrivee_code;
-    """)
-    
-    count_result = await db.execute(sql_query, {"vn": velo_name})
+async def check_boomerang(
+    velo_name: str,
+    db: AsyncSession = Depends(get_db),
+    with_count: bool = Query(False, description="Compter aussi les trajets boomerang (plus coûteux qu'un simple test d'existence)")
+):
+    if not with_count:
+        exists_result = await db.execute(STMT_BOOMERANG_EXISTS, {"vn": velo_name})
+        return {"velo_name": velo_name, "is_boomerang_user": exists_result.scalar_one()}
+
+    count_result = await db.execute(STMT_BOOMERANG_COUNT, {"vn": velo_name})
     count_value = count_result.scalar_one()
     
     return {"velo_name": velo_name, "is_boomerang_user": count_value > 0, "count": count_value}
 
 
 @router_analysis.get("/trajets/by_day", response_model=List[TrajetsByDayStats], summary="Statistiques de trajets agrégées par jour")
+@cached(ttl=ANALYSIS_CACHE_TTL)
 async def get_trajets_by_day(
     db: AsyncSession = Depends(get_db),
     start_date: Optional[dt.date] = Query(None, description="Date de début (YYYY-MM-DD)"),
     end_date: Optional[dt.date] = Query(None, description="Date de fin (YYYY-MM-DD)")
 ):
-    where_clause = []
-    params = {}
-    
-    if start_date:
-        where_clause.append("date(heure_depart) >= :start_date")
-        params['start_date'] = start_date
-        
-    if end_date:
-        where_clause.append("date(heure_depart) <= :end_date")
-        params['end_date'] = end_date
-        
-    where_sql = f"WHERE {' AND '.join(where_clause)}" if where_clause else ""
-
-    sql_query = text(f"""
-        SELECT 
-            date(heure_depart) AS jour, 
-            COUNT(*) AS nombre_trajets,
-            AVG(duree_trajet_minutes) AS duree_moyenne_minutes
-        FROM V_TRAJETS
-        {where_sql}
-        GROUP BY 1
-        ORDER BY jour;
-    """)
+    sql_query = STMTS_TRAJETS_BY_DAY[(start_date is not None, end_date is not None)]
+    params = {"start_date": start_date, "end_date": end_date}
     
     result = await db.execute(sql_query, params)
     rows = result.all()
-    return [TrajetsByDayStats.model_validate(row, from_attributes=True) for row in rows]
+    # Réponse déjà sérialisée : c'est elle qui est mise en cache, les hits renvoient les octets tels quels
+    return await rows_json(rows)
 
 
 @router_analysis.get("/stations/top_source_destination", response_model=List[StationTraffic], summary="Top N des stations générant le plus de départs/arrivées")
+@cached(ttl=ANALYSIS_CACHE_TTL)
 async def get_top_source_destination(
     db: AsyncSession = Depends(get_db),
     limit: int = Query(20, ge=1, le=100)
 ):
-    sql_query = text(f"""
-        WITH Flux AS (
-            SELECT station_depart_code AS station_code, 'Depart' AS type_flux, COUNT(*) AS nombre_flux FROM V_TRAJETS GROUP BY 1
-            UNION ALL
-            SELECT station_arrivee_code AS station_code, 'Arrivee' AS type_flux, COUNT(*) AS nombre_flux FROM V_TRAJETS GROUP BY 1
-        )
-        SELECT 
-            f.station_code,
-            s.name AS station_name,
-            f.type_flux,
-            SUM(f.nombre_flux) AS nombre_flux
-        FROM Flux f
-        JOIN station s ON s.station_code = f.station_code
-        GROUP BY f.station_code, s.name, f.type_flux
-        ORDER BY nombre_flux DESC
-        LIMIT :limit;
-    """)
-    
-    result = await db.execute(sql_query, {"limit": limit})
+    result = await db.execute(STMT_TOP_SOURCE_DESTINATION, {"limit": limit})
     rows = result.all()
-    return [StationTraffic.model_validate(row, from_attributes=True) for row in rows]
+    return rows_to(StationTraffic, rows)
 
 
 @router_analysis.get("/stations/flow_imbalance", response_model=List[StationFlowImbalance], summary="Déséquilibre de flux (Départs - Arrivées) sur une période")
+@cached(ttl=ANALYSIS_CACHE_TTL)
 async def get_flow_imbalance(
     db: AsyncSession = Depends(get_db),
     limit: int = Query(20, ge=1, le=100),
     start_date: Optional[dt.date] = Query(None, description="Date de début (YYYY-MM-DD)"),
     end_date: Optional[dt.date] = Query(None, description="Date de fin (YYYY-MM-DD)")
 ):
-    where_clause = []
-    params = {"limit": limit}
-
-    if start_date:
-        where_clause.append("heure_depart >= :start_date")
-        params['start_date'] = start_date
-
-    if end_date:
-        where_clause.append("heure_depart < :end_date + INTERVAL '1 day'")
-        params['end_date'] = end_date
-        
-    where_sql = f"WHERE {' AND '.join(where_clause)}" if where_clause else ""
-    
-    sql_query = text(f"""
-        WITH FilteredTrajets AS (
-            SELECT * FROM V_TRAJETS
-            {where_sql}
-        ),
-        Departures AS (
-            SELECT station_depart_code AS code, COUNT(*) AS departures FROM FilteredTrajets GROUP BY 1
-        ),
-        Arrivals AS (
-            SELECT station_arrivee_code AS code, COUNT(*) AS arrivals FROM FilteredTrajets GROUP BY 1
-        )
-        -- Le reste de la requête d'agrégation reste inchangé...
-        SELECT 
-            s.station_code,
-            s.name AS station_name,
-            COALESCE(d.departures, 0) AS departures,
-            COALESCE(a.arrivals, 0) AS arrivals,
-            (COALESCE(d.departures, 0) - COALESCE(a.arrivals, 0)) AS imbalance
-        FROM station s
-        LEFT JOIN Departures d ON s.station_code = d.code
-        LEFT JOIN Arrivals a ON s.station_code = a.code
-        ORDER BY ABS(imbalance) DESC
-        LIMIT :limit;
-    """)
+    sql_query = STMTS_FLOW_IMBALANCE[(start_date is not None, end_date is not None)]
+    params = {"limit": limit, "start_date": start_date, "end_date": end_date}
     
     result = await db.execute(sql_query, params)
     rows = result.all()
-    return [StationFlowImbalance.model_validate(row, from_attributes=True) for row in rows]
+    return rows_to(StationFlowImbalance, rows)
 
 
 @router_analysis.get("/velos/top_used", response_model=List[TopVelo], summary="Top N des vélos les plus utilisés (par nombre de trajets)")
+@cached(ttl=ANALYSIS_CACHE_TTL)
 async def get_top_used_velos(
     db: AsyncSession = Depends(get_db),
     limit: int = Query(10, ge=1, le=50)
 ):
-    sql_query = text(f"""
-        SELECT 
-            velo_name,
-            COUNT(*) AS nombre_trajets,
-            SUM(duree_trajet_minutes) / 60.0 AS duree_totale_heures
-        FROM V_TRAJETS
-        GROUP BY velo_name
-        ORDER BY nombre_trajets DESC
-        LIMIT :limit;
-    """)
-    
-    result = await db.execute(sql_query, {"limit": limit})
+    result = await db.execute(STMT_TOP_USED_VELOS, {"limit": limit})
     rows = result.all()
-    return [TopVelo.model_validate(row, from_attributes=True) for row in rows]
+    return rows_to(TopVelo, rows)
 
 
 @router_analysis.get("/trajets/average_by_route", response_model=List[AverageRouteStats], summary="Durée moyenne des trajets par paire de stations")
+@cached(ttl=ANALYSIS_CACHE_TTL)
 async def get_average_duration_by_route(
     db: AsyncSession = Depends(get_db),
     limit: int = Query(10, ge=1, le=50)
 ):
-    sql_query = text(f"""
-        SELECT 
-            station_depart_code,
-            station_arrivee_code,
-            AVG(duree_trajet_minutes) AS duree_moyenne_minutes
-        FROM V_TRAJETS
-        GROUP BY 1, 2
-        ORDER BY duree_moyenne_minutes DESC
-        LIMIT :limit;
-    """)
-    
-    result = await db.execute(sql_query, {"limit": limit})
+    result = await db.execute(STMT_AVERAGE_BY_ROUTE, {"limit": limit})
     rows = result.all()
-    return [AverageRouteStats.model_validate(row, from_attributes=True) for row in rows]
+    return rows_to(AverageRouteStats, rows)
+
+
+# Une connexion du pool par requête : les agrégats du tableau de bord s'exécutent en parallèle
+async def fetch_all_on_own_connection(stmt, params):
+    async with engine.connect() as conn:
+        result = await conn.execute(stmt, params)
+        return result.all()
+
+
+@router_analysis.get("/dashboard/overview", response_model=DashboardOverview, summary="Tableau de bord : top trajets, déséquilibre des stations et top vélos en un appel")
+@cached(ttl=ANALYSIS_CACHE_TTL)
+async def get_dashboard_overview(
+    limit: int = Query(10, ge=1, le=50),
+    start_date: Optional[dt.date] = Query(None, description="Date de début (YYYY-MM-DD), pour les trajets et le déséquilibre"),
+    end_date: Optional[dt.date] = Query(None, description="Date de fin (YYYY-MM-DD), pour les trajets et le déséquilibre")
+):
+    date_filters = (start_date is not None, end_date is not None)
+    params = {"limit": limit, "start_date": start_date, "end_date": end_date}
+
+    # Durée totale = la plus lente des trois requêtes, et non leur somme
+    top_routes, flow_imbalance, top_velos = await asyncio.gather(
+        fetch_all_on_own_connection(STMTS_TOP_ROUTES[date_filters], params),
+        fetch_all_on_own_connection(STMTS_FLOW_IMBALANCE[date_filters], params),
+        fetch_all_on_own_connection(STMT_TOP_USED_VELOS, {"limit": limit}),
+    )
+
+    return DashboardOverview.model_construct(
+        top_routes=rows_to(TrajetStats, top_routes),
+        flow_imbalance=rows_to(StationFlowImbalance, flow_imbalance),
+        top_velos=rows_to(TopVelo, top_velos),
+    )
 
 
 # =================================================================
@@ -680,6 +609,41 @@ app.include_router(router_dims)
 app.include_router(router_facts)
 app.include_router(router_analysis)
 
+# =================================================================
+# 7. RAFRAÎCHISSEMENT DES VUES MATÉRIALISÉES (tâche de fond)
+# =================================================================
+
+async def refresh_materialized_views():
+    """
+    Rafraîchit périodiquement les vues matérialisées lues par le router d'analyse.
+    Avec plusieurs workers, le verrou consultatif évite les rafraîchissements en double.
+    """
+    while True:
+        await asyncio.sleep(MV_REFRESH_SECONDS)
+        try:
+            async with engine.begin() as conn:
+                locked = (await conn.execute(STMT_MV_REFRESH_LOCK)).scalar_one()
+                if not locked:
+                    continue
+                for stmt in STMTS_MV_REFRESH:
+                    await conn.execute(stmt)
+            # Nouvelles données : les résultats en cache de ce worker sont périmés
+            # (ceux des autres workers expirent avec leur TTL)
+            bump_generation()
+        except Exception as e:
+            logger.error(f"Materialized view refresh failed: {e}")
+
+
+@app.on_event("startup")
+async def start_mv_refresh():
+    app.state.mv_refresh_task = asyncio.create_task(refresh_materialized_views())
+
+
+@app.on_event("shutdown")
+async def stop_mv_refresh():
+    app.state.mv_refresh_task.cancel()
+
+
 # Route racine pour l'état de l'API
 @app.get("/", tags=["Status"])
 def root():
@@ -0,0 +1,17 @@
+-- =================================================================
+-- 001 - Index couvrants pour l'état actuel d'une station
+-- Endpoint : GET /api/v1/facts/stations/{station_code}/etat_actuel
+--
+-- CREATE INDEX CONCURRENTLY ne peut pas tourner dans une transaction :
+--   psql -d JeVelibererLaData -f app/migrations/001_etat_station_current_state_index.sql
+-- =================================================================
+
+-- Les états d'une station sont lus directement depuis l'index (index-only scan)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS etat_station_code_snapshot_desc_idx
+    ON etat_station (station_code, snapshot_id DESC)
+    INCLUDE (nbbike, nbebike, nbfreedock, state);
+
+-- La jointure vers snapshot récupère timestamp_capture sans accès à la table
+CREATE INDEX CONCURRENTLY IF NOT EXISTS snapshot_id_timestamp_idx
+    ON snapshot (snapshot_id)
+    INCLUDE (timestamp_capture);
@@ -0,0 +1,50 @@
+-- =================================================================
+-- 002 - Vues matérialisées des agrégats de V_TRAJETS
+-- Les endpoints d'analyse lisent ces vues (O(groupes)) au lieu de
+-- réagréger V_TRAJETS (O(trajets)) à chaque requête.
+-- Rafraîchies par l'API (REFRESH MATERIALIZED VIEW CONCURRENTLY),
+-- d'où les index UNIQUE obligatoires.
+-- =================================================================
+
+-- Trajets par jour : /trajets/by_day
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_trajets_by_day AS
+SELECT
+    date(heure_depart) AS jour,
+    COUNT(*) AS nombre_trajets,
+    AVG(duree_trajet_minutes) AS duree_moyenne_minutes
+FROM V_TRAJETS
+GROUP BY 1
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_trajets_by_day_uidx
+    ON mv_trajets_by_day (jour);
+
+-- Trajets par paire de stations et par jour :
+-- /trajets/top_routes, /trajets/average_by_route,
+-- /stations/top_source_destination, /stations/flow_imbalance
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_routes_by_day AS
+SELECT
+    date(heure_depart) AS jour,
+    station_depart_code,
+    station_arrivee_code,
+    COUNT(*) AS nombre_trajets,
+    SUM(duree_trajet_minutes) AS duree_totale_minutes
+FROM V_TRAJETS
+GROUP BY 1, 2, 3
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_routes_by_day_uidx
+    ON mv_routes_by_day (jour, station_depart_code, station_arrivee_code);
+
+-- Utilisation par vélo : /velos/top_used
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_velo_usage AS
+SELECT
+    velo_name,
+    COUNT(*) AS nombre_trajets,
+    SUM(duree_trajet_minutes) AS duree_totale_minutes
+FROM V_TRAJETS
+GROUP BY velo_name
+WITH DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS mv_velo_usage_uidx
+    ON mv_velo_usage (velo_name);
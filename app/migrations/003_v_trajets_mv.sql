@@ -0,0 +1,77 @@
+-- =================================================================
+-- 003 - Matérialisation de V_TRAJETS
+-- Tous les endpoints d'analyse lisent v_trajets_mv (table précalculée
+-- et indexée) au lieu de recalculer les trajets à chaque requête.
+-- Rafraîchie par l'API (REFRESH MATERIALIZED VIEW CONCURRENTLY).
+-- =================================================================
+
+-- Triée par heure_depart à la création seulement : REFRESH ... CONCURRENTLY applique
+-- un différentiel (suppressions/insertions) qui ne conserve pas cet ordre physique.
+CREATE MATERIALIZED VIEW IF NOT EXISTS v_trajets_mv AS
+SELECT
+    velo_name,
+    station_depart_code,
+    heure_depart,
+    station_arrivee_code,
+    heure_arrivee,
+    duree_trajet_minutes
+FROM V_TRAJETS
+ORDER BY heure_depart
+WITH DATA;
+
+-- Un vélo ne peut pas partir deux fois au même instant : clé requise par REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS v_trajets_mv_velo_heure_uidx
+    ON v_trajets_mv (velo_name, heure_depart);
+
+CREATE INDEX IF NOT EXISTS v_trajets_mv_heure_idx
+    ON v_trajets_mv (heure_depart);
+
+CREATE INDEX IF NOT EXISTS v_trajets_mv_depart_idx
+    ON v_trajets_mv (station_depart_code);
+
+CREATE INDEX IF NOT EXISTS v_trajets_mv_arrivee_idx
+    ON v_trajets_mv (station_arrivee_code);
+
+-- Les agrégats de la migration 002 sont reconstruits à partir de v_trajets_mv
+-- (la définition d'une vue matérialisée ne peut pas être modifiée en place).
+DROP MATERIALIZED VIEW IF EXISTS mv_trajets_by_day;
+DROP MATERIALIZED VIEW IF EXISTS mv_routes_by_day;
+DROP MATERIALIZED VIEW IF EXISTS mv_velo_usage;
+
+CREATE MATERIALIZED VIEW mv_trajets_by_day AS
+SELECT
+    date(heure_depart) AS jour,
+    COUNT(*) AS nombre_trajets,
+    AVG(duree_trajet_minutes) AS duree_moyenne_minutes
+FROM v_trajets_mv
+GROUP BY 1
+WITH DATA;
+
+CREATE UNIQUE INDEX mv_trajets_by_day_uidx
+    ON mv_trajets_by_day (jour);
+
+CREATE MATERIALIZED VIEW mv_routes_by_day AS
+SELECT
+    date(heure_depart) AS jour,
+    station_depart_code,
+    station_arrivee_code,
+    COUNT(*) AS nombre_trajets,
+    SUM(duree_trajet_minutes) AS duree_totale_minutes
+FROM v_trajets_mv
+GROUP BY 1, 2, 3
+WITH DATA;
+
+CREATE UNIQUE INDEX mv_routes_by_day_uidx
+    ON mv_routes_by_day (jour, station_depart_code, station_arrivee_code);
+
+CREATE MATERIALIZED VIEW mv_velo_usage AS
+SELECT
+    velo_name,
+    COUNT(*) AS nombre_trajets,
+    SUM(duree_trajet_minutes) AS duree_totale_minutes
+FROM v_trajets_mv
+GROUP BY velo_name
+WITH DATA;
+
+CREATE UNIQUE INDEX mv_velo_usage_uidx
+    ON mv_velo_usage (velo_name);
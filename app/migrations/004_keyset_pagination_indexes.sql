@@ -0,0 +1,10 @@
+-- =================================================================
+-- 004 - Index de la pagination par curseur (keyset)
+-- /facts/localisations : ORDER BY loc_id DESC, servi par la clé primaire
+-- (un index B-tree se parcourt aussi bien à l'envers).
+-- /analysis/trajets : ORDER BY heure_depart DESC, velo_name DESC
+-- avec le curseur (heure_depart, velo_name) < (...).
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS v_trajets_mv_heure_velo_idx
+    ON v_trajets_mv (heure_depart DESC, velo_name DESC);
@@ -0,0 +1,29 @@
+-- =================================================================
+-- 005 - timestamp_capture dénormalisé sur etat_station
+-- Endpoint : GET /api/v1/facts/stations/{station_code}/etat_actuel
+-- L'état le plus récent se lit dans un seul index couvrant, sans
+-- jointure vers snapshot. L'ETL renseigne la colonne à l'insertion.
+-- =================================================================
+
+ALTER TABLE etat_station ADD COLUMN IF NOT EXISTS timestamp_capture TIMESTAMP;
+
+-- Reprise de l'historique (une seule fois ; long sur une base complète)
+UPDATE etat_station es
+SET timestamp_capture = s.timestamp_capture
+FROM snapshot s
+WHERE s.snapshot_id = es.snapshot_id
+  AND es.timestamp_capture IS NULL;
+
+-- Toute ligne doit porter son horodatage : une insertion sans la colonne
+-- (ancien ETL) échoue au lieu de devenir l'« état actuel » de la station.
+ALTER TABLE etat_station ALTER COLUMN timestamp_capture SET NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS etat_station_code_ts_desc_idx
+    ON etat_station (station_code, timestamp_capture DESC NULLS LAST)
+    INCLUDE (nbbike, nbebike, nbfreedock, state);
+
+-- Index de la migration 001 devenus inutiles (plus de jointure vers snapshot)
+DROP INDEX CONCURRENTLY IF EXISTS etat_station_code_snapshot_desc_idx;
+DROP INDEX CONCURRENTLY IF EXISTS snapshot_id_timestamp_idx;
+
+ANALYZE etat_station;
@@ -0,0 +1,10 @@
+-- =================================================================
+-- 006 - Index partiel des trajets boomerang (départ = arrivée)
+-- Endpoint : GET /api/v1/analysis/velos/{velo_name}/boomerang
+-- Ne contient que les trajets boomerang : EXISTS comme COUNT(*)
+-- ne lisent que les lignes utiles du vélo demandé.
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS v_trajets_mv_boomerang_idx
+    ON v_trajets_mv (velo_name)
+    WHERE station_depart_code = station_arrivee_code;
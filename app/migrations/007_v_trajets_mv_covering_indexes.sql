@@ -0,0 +1,29 @@
+-- =================================================================
+-- 007 - Index couvrants de v_trajets_mv
+-- Les requêtes de trajets lisent directement l'index (index-only
+-- scan) au lieu d'aller chercher chaque ligne dans la table.
+-- =================================================================
+
+-- Le B-tree heure_depart de la migration 003 est redondant avec l'index
+-- (heure_depart DESC, velo_name DESC) de 004, qui sert aussi les plages de dates.
+DROP INDEX CONCURRENTLY IF EXISTS v_trajets_mv_heure_idx;
+
+-- Paire de stations : durée lue dans l'index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS v_trajets_mv_route_idx
+    ON v_trajets_mv (station_depart_code, station_arrivee_code)
+    INCLUDE (duree_trajet_minutes);
+
+-- Couvert par v_trajets_mv_route_idx (même première colonne)
+DROP INDEX CONCURRENTLY IF EXISTS v_trajets_mv_depart_idx;
+
+-- Trajets d'un vélo (/trajets/velo/{velo_name}, /stations_visitees) : toutes les
+-- colonnes lues sont dans l'index. Toujours UNIQUE : il remplace la clé de la
+-- migration 003 exigée par REFRESH ... CONCURRENTLY.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS v_trajets_mv_velo_heure_covering_uidx
+    ON v_trajets_mv (velo_name, heure_depart)
+    INCLUDE (station_depart_code, station_arrivee_code, heure_arrivee, duree_trajet_minutes);
+
+DROP INDEX CONCURRENTLY IF EXISTS v_trajets_mv_velo_heure_uidx;
+
+-- Carte de visibilité à jour (nécessaire aux index-only scans) et statistiques
+VACUUM ANALYZE v_trajets_mv;
@@ -0,0 +1,15 @@
+-- =================================================================
+-- 008 - Index des filtres des listes de dimensions
+-- GET /api/v1/dimensions/velos?search=... : velo_name ILIKE '%...%'
+-- GET /api/v1/dimensions/stations?station_type=... : type = ...
+-- =================================================================
+
+-- Index trigrammes : utilisable par ILIKE même avec un '%' en tête
+-- (CREATE EXTENSION demande les droits adéquats sur la base)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS velo_name_trgm_idx
+    ON velo USING GIN (velo_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS station_type_idx
+    ON station (type);
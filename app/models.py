@@ -124,3 +124,9 @@ class VeloStationsCount(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class DashboardOverview(BaseModel):
+    top_routes: List[TrajetStats]
+    flow_imbalance: List[StationFlowImbalance]
+    top_velos: List[TopVelo]
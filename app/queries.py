@@ -0,0 +1,344 @@
+from sqlalchemy import text
+
+# =================================================================
+# REQUÊTES SQL PRÉCOMPILÉES
+# Construites une seule fois à l'import : SQLAlchemy réutilise sa
+# compilation en cache et asyncpg ses requêtes préparées.
+# =================================================================
+
+# Colonnes explicites (jamais de SELECT *) : seules celles des modèles de réponse.
+# Les champs float des modèles sont castés en float8 : les réponses sont construites
+# sans validation (model_construct), un NUMERIC arriverait en Decimal (sérialisé en chaîne).
+STATION_BASIC_COLS = "station_code, name, latitude::float8 AS latitude, longitude::float8 AS longitude, type"  # StationBase
+STATION_COLS = f"{STATION_BASIC_COLS}, nbdock_total, maxbikeoverflow"  # StationRead
+VELO_COLS = "velo_name, bikeelectric"  # VeloRead
+
+# ----- DIMENSIONS : STATION -----
+
+def _stations_stmt(by_type: bool, basic: bool):
+    columns = STATION_BASIC_COLS if basic else STATION_COLS
+    where_clause = " WHERE type = :st_type" if by_type else ""
+    return text(f"SELECT {columns} FROM station{where_clause} ORDER BY station_code")
+
+# Une requête par combinaison : clé (filtre type ?, colonnes de base seulement ?)
+STMTS_STATIONS = {
+    (by_type, basic): _stations_stmt(by_type, basic)
+    for by_type in (False, True)
+    for basic in (False, True)
+}
+
+STMT_STATION_BY_CODE = text(f"SELECT {STATION_COLS} FROM station WHERE station_code = :code")
+
+STMT_STATION_UPSERT = text("""
+    INSERT INTO station (station_code, name, latitude, longitude, type)
+    VALUES (:station_code, :name, :latitude, :longitude, :type)
+    ON CONFLICT (station_code) DO UPDATE
+    SET name = EXCLUDED.name, latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude, type = EXCLUDED.type
+    RETURNING station_code;
+""")
+
+# Upsert en masse : une seule requête (et un seul plan préparé) quel que soit
+# le nombre de stations, les colonnes étant passées en tableaux.
+STMT_STATION_BULK_UPSERT = text("""
+    INSERT INTO station (station_code, name, latitude, longitude, type)
+    SELECT * FROM unnest(
+        CAST(:station_codes AS text[]),
+        CAST(:names AS text[]),
+        CAST(:latitudes AS double precision[]),
+        CAST(:longitudes AS double precision[]),
+        CAST(:types AS text[])
+    )
+    ON CONFLICT (station_code) DO UPDATE
+    SET name = EXCLUDED.name, latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude, type = EXCLUDED.type;
+""")
+
+STMT_STATION_UPDATE = text(f"""
+    UPDATE station
+    SET name = :name, latitude = :latitude, longitude = :longitude, type = :type
+    WHERE station_code = :code
+    RETURNING {STATION_COLS};
+""")
+
+STMT_STATION_DELETE = text("DELETE FROM station WHERE station_code = :code RETURNING station_code;")
+
+# ----- DIMENSIONS : VELO -----
+
+def _velos_stmt(by_electric: bool, by_search: bool):
+    conditions = []
+    if by_electric:
+        conditions.append("bikeelectric = :is_electric")
+    if by_search:
+        conditions.append("velo_name ILIKE :search_term")
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    return text(f"SELECT {VELO_COLS} FROM velo{where_clause} ORDER BY velo_name")
+
+# Une requête par combinaison de filtres : clé (filtre electric ?, filtre search ?)
+STMTS_VELOS = {
+    (by_electric, by_search): _velos_stmt(by_electric, by_search)
+    for by_electric in (False, True)
+    for by_search in (False, True)
+}
+
+STMT_VELO_INSERT = text("""
+    INSERT INTO velo (velo_name, bikeelectric)
+    VALUES (:velo_name, :bikeelectric)
+    ON CONFLICT (velo_name) DO NOTHING;
+""")
+
+STMT_VELO_UPDATE = text(f"""
+    UPDATE velo
+    SET bikeelectric = :bikeelectric
+    WHERE velo_name = :vn
+    RETURNING {VELO_COLS}; -- Retourne la ligne mise à jour
+""")
+
+STMT_VELO_DELETE = text("DELETE FROM velo WHERE velo_name = :vn RETURNING velo_name;")
+
+# ----- FAITS -----
+
+# timestamp_capture est dénormalisé sur etat_station (cf. migrations/005) :
+# une seule lecture de l'index couvrant (station_code, timestamp_capture DESC NULLS LAST)
+STMT_STATION_CURRENT_STATE = text("""
+    SELECT station_code, timestamp_capture, nbbike, nbebike, nbfreedock, state
+    FROM etat_station
+    WHERE station_code = :code
+    ORDER BY timestamp_capture DESC NULLS LAST
+    LIMIT 1;
+""")
+
+# SQL brut (paramètres asyncpg $n), exécuté directement sur la connexion asyncpg.
+# Pagination par curseur (keyset) : la page suivante repart du dernier loc_id lu,
+# coût constant quelle que soit la profondeur (pas d'OFFSET à parcourir).
+SQL_RECENT_LOCS = """
+    SELECT loc_id, snapshot_id, velo_name, station_code, bikestatus
+    FROM localisation_velo
+    ORDER BY loc_id DESC
+    LIMIT $1;
+"""
+
+SQL_RECENT_LOCS_AFTER = """
+    SELECT loc_id, snapshot_id, velo_name, station_code, bikestatus
+    FROM localisation_velo
+    WHERE loc_id < $2
+    ORDER BY loc_id DESC
+    LIMIT $1;
+"""
+
+STMT_LOCATION_DELETE = text("DELETE FROM localisation_velo WHERE loc_id = :id RETURNING loc_id;")
+
+# ----- ANALYSE (VUE MATÉRIALISÉE v_trajets_mv, cf. migrations/003) -----
+
+# SQL brut (paramètres asyncpg $n), exécuté directement sur la connexion asyncpg.
+# Pagination par curseur sur (heure_depart, velo_name) : heure_depart seule
+# n'est pas unique, le couple l'est (cf. index unique de v_trajets_mv).
+SQL_TRAJETS_PAGE = """
+    SELECT velo_name, station_depart_code, heure_depart, station_arrivee_code, heure_arrivee, duree_trajet_minutes
+    FROM v_trajets_mv
+    ORDER BY heure_depart DESC, velo_name DESC
+    LIMIT $1;
+"""
+
+SQL_TRAJETS_PAGE_AFTER = """
+    SELECT velo_name, station_depart_code, heure_depart, station_arrivee_code, heure_arrivee, duree_trajet_minutes
+    FROM v_trajets_mv
+    WHERE heure_depart < $2
+    ORDER BY heure_depart DESC, velo_name DESC
+    LIMIT $1;
+"""
+
+SQL_TRAJETS_PAGE_AFTER_VELO = """
+    SELECT velo_name, station_depart_code, heure_depart, station_arrivee_code, heure_arrivee, duree_trajet_minutes
+    FROM v_trajets_mv
+    WHERE (heure_depart, velo_name) < ($2, $3)
+    ORDER BY heure_depart DESC, velo_name DESC
+    LIMIT $1;
+"""
+
+# Export complet, lu par curseur serveur (cf. /trajets/stream)
+STMT_TRAJETS_STREAM = text("""
+    SELECT velo_name, station_depart_code, heure_depart, station_arrivee_code, heure_arrivee, duree_trajet_minutes
+    FROM v_trajets_mv
+    ORDER BY heure_depart DESC, velo_name DESC;
+""")
+
+STMT_TRAJETS_BY_VELO = text("""
+    SELECT velo_name, station_depart_code, heure_depart, station_arrivee_code, heure_arrivee, duree_trajet_minutes
+    FROM v_trajets_mv
+    WHERE velo_name = :velo_name
+    ORDER BY heure_depart DESC
+    LIMIT :limit OFFSET :offset;
+""")
+
+# Bornes de période sur heure_depart (la journée de référence est incluse).
+# CAST explicite : sans lui, asyncpg type :date_ref d'après l'opérande voisin
+# (interval dans `:date_ref - INTERVAL ...`) et la comparaison échoue.
+_PERIODE_CONDITIONS = {
+    "jour": "heure_depart >= CAST(:date_ref AS date) AND heure_depart < CAST(:date_ref AS date) + INTERVAL '1 day'",
+    "semaine": "heure_depart >= CAST(:date_ref AS date) - INTERVAL '7 days' AND heure_depart < CAST(:date_ref AS date) + INTERVAL '1 day'",
+    "mois": "heure_depart >= CAST(:date_ref AS date) - INTERVAL '1 month' AND heure_depart < CAST(:date_ref AS date) + INTERVAL '1 day'",
+    "annee": "heure_depart >= CAST(:date_ref AS date) - INTERVAL '1 year' AND heure_depart < CAST(:date_ref AS date) + INTERVAL '1 day'",
+}
+
+# Trajets du vélo filtrés une seule fois (CTE matérialisée), puis départ et
+# arrivée de chaque trajet dépliés en deux lignes. Une requête par période.
+STMTS_VELO_STATIONS_COUNT = {
+    periode: text(f"""
+        WITH ft AS MATERIALIZED (
+            SELECT station_depart_code AS a, station_arrivee_code AS b
+            FROM v_trajets_mv
+            WHERE velo_name = :vn AND {condition}
+        )
+        SELECT COUNT(DISTINCT v.st)
+        FROM ft, LATERAL (VALUES (ft.a), (ft.b)) AS v(st);
+    """)
+    for periode, condition in _PERIODE_CONDITIONS.items()
+}
+
+# EXISTS s'arrête au premier trajet boomerang trouvé (index partiel, cf. migrations/006)
+STMT_BOOMERANG_EXISTS = text("""
+    SELECT EXISTS (
+        SELECT 1
+        FROM v_trajets_mv
+        WHERE velo_name = :vn
+        AND station_depart_code = station_arrivee_code
+    );
+""")
+
+STMT_BOOMERANG_COUNT = text("""
+    SELECT COUNT(*)
+    FROM v_trajets_mv
+    WHERE velo_name = :vn
+    AND station_depart_code = station_arrivee_code;
+""")
+
+# ----- ANALYSE (VUES MATÉRIALISÉES, cf. migrations/002) -----
+
+# Une seule agrégation : chaque route compte en départ pour sa station d'origine
+# et en arrivée pour sa destination, puis les deux totaux sont remis en lignes.
+STMT_TOP_SOURCE_DESTINATION = text("""
+    WITH Flux AS (
+        SELECT
+            v.code,
+            SUM(v.dep)::bigint AS departs,
+            SUM(v.arr)::bigint AS arrivees
+        FROM mv_routes_by_day r,
+             LATERAL (VALUES
+                 (r.station_depart_code, r.nombre_trajets, 0),
+                 (r.station_arrivee_code, 0, r.nombre_trajets)
+             ) AS v(code, dep, arr)
+        GROUP BY v.code
+    )
+    SELECT
+        f.code AS station_code,
+        s.name AS station_name,
+        t.type_flux,
+        t.nombre_flux
+    FROM Flux f
+    JOIN station s ON s.station_code = f.code,
+         LATERAL (VALUES ('Depart', f.departs), ('Arrivee', f.arrivees)) AS t(type_flux, nombre_flux)
+    WHERE t.nombre_flux > 0
+    ORDER BY t.nombre_flux DESC
+    LIMIT :limit;
+""")
+
+STMT_TOP_USED_VELOS = text("""
+    SELECT
+        velo_name,
+        nombre_trajets,
+        (duree_totale_minutes / 60.0)::float8 AS duree_totale_heures
+    FROM mv_velo_usage
+    ORDER BY nombre_trajets DESC
+    LIMIT :limit;
+""")
+
+STMT_AVERAGE_BY_ROUTE = text("""
+    SELECT
+        station_depart_code,
+        station_arrivee_code,
+        (SUM(duree_totale_minutes) / SUM(nombre_trajets))::float8 AS duree_moyenne_minutes
+    FROM mv_routes_by_day
+    GROUP BY 1, 2
+    ORDER BY duree_moyenne_minutes DESC
+    LIMIT :limit;
+""")
+
+# Filtres de dates optionnels sur `jour` (bornes incluses) : une requête
+# précompilée par combinaison, clé (start_date fourni ?, end_date fourni ?)
+def _jour_where(by_start: bool, by_end: bool):
+    conditions = []
+    if by_start:
+        conditions.append("jour >= :start_date")
+    if by_end:
+        conditions.append("jour <= :end_date")
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+def _by_date_filters(build):
+    return {
+        (by_start, by_end): text(build(_jour_where(by_start, by_end)))
+        for by_start in (False, True)
+        for by_end in (False, True)
+    }
+
+STMTS_TOP_ROUTES = _by_date_filters(lambda where_sql: f"""
+    SELECT 
+        station_depart_code,
+        station_arrivee_code,
+        SUM(nombre_trajets)::bigint AS nombre_trajets,
+        (SUM(duree_totale_minutes) / SUM(nombre_trajets))::float8 AS duree_moyenne_minutes
+    FROM mv_routes_by_day
+    {where_sql}
+    GROUP BY 1, 2
+    ORDER BY nombre_trajets DESC
+    LIMIT :limit;
+""")
+
+STMTS_TRAJETS_BY_DAY = _by_date_filters(lambda where_sql: f"""
+    SELECT jour, nombre_trajets, duree_moyenne_minutes::float8 AS duree_moyenne_minutes
+    FROM mv_trajets_by_day
+    {where_sql}
+    ORDER BY jour;
+""")
+
+STMTS_FLOW_IMBALANCE = _by_date_filters(lambda where_sql: f"""
+    WITH FilteredRoutes AS (
+        SELECT station_depart_code, station_arrivee_code, nombre_trajets FROM mv_routes_by_day
+        {where_sql}
+    ),
+    -- Un seul parcours : chaque route compte en départ pour sa station d'origine et en arrivée pour sa destination
+    Flux AS (
+        SELECT
+            v.code,
+            SUM(v.dep)::bigint AS departures,
+            SUM(v.arr)::bigint AS arrivals
+        FROM FilteredRoutes r,
+             LATERAL (VALUES
+                 (r.station_depart_code, r.nombre_trajets, 0),
+                 (r.station_arrivee_code, 0, r.nombre_trajets)
+             ) AS v(code, dep, arr)
+        GROUP BY v.code
+    )
+    SELECT 
+        s.station_code,
+        s.name AS station_name,
+        COALESCE(f.departures, 0) AS departures,
+        COALESCE(f.arrivals, 0) AS arrivals,
+        (COALESCE(f.departures, 0) - COALESCE(f.arrivals, 0)) AS imbalance
+    FROM station s
+    LEFT JOIN Flux f ON s.station_code = f.code
+    -- Un alias de sortie n'est pas utilisable dans une expression d'ORDER BY
+    ORDER BY ABS(COALESCE(f.departures, 0) - COALESCE(f.arrivals, 0)) DESC
+    LIMIT :limit;
+""")
+
+# ----- RAFRAÎCHISSEMENT DES VUES MATÉRIALISÉES -----
+
+# Verrou consultatif (transactionnel) : un seul worker rafraîchit à la fois
+STMT_MV_REFRESH_LOCK = text("SELECT pg_try_advisory_xact_lock(hashtext('velib_mv_refresh'));")
+
+# Ordre important : les agrégats sont calculés à partir de v_trajets_mv
+STMTS_MV_REFRESH = (
+    text("REFRESH MATERIALIZED VIEW CONCURRENTLY v_trajets_mv;"),
+    text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_trajets_by_day;"),
+    text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_routes_by_day;"),
+    text("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_velo_usage;"),
+)
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Les modules de l'application s'importent à plat (cf. main.py : `from models import ...`)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def api_client():
+    """
+    Client HTTP sur l'API réelle : nécessite une base PostgreSQL de test
+    (variables DB_* ou .env) avec le schéma et les migrations appliqués.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    if not os.getenv("DB_HOST"):
+        pytest.skip("base PostgreSQL de test requise (variables DB_*)")
+
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
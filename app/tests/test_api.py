@@ -0,0 +1,41 @@
+import pytest
+
+ANALYSIS = "/api/v1/analysis"
+
+
+def test_flow_imbalance(api_client):
+    response = api_client.get(f"{ANALYSIS}/stations/flow_imbalance", params={"limit": 5})
+    assert response.status_code == 200
+    for row in response.json():
+        assert row["imbalance"] == row["departures"] - row["arrivals"]
+
+
+def test_dashboard_overview(api_client):
+    response = api_client.get(
+        f"{ANALYSIS}/dashboard/overview",
+        params={"limit": 5, "start_date": "2024-01-01", "end_date": "2024-12-31"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"top_routes", "flow_imbalance", "top_velos"}
+    for route in body["top_routes"]:
+        assert isinstance(route["duree_moyenne_minutes"], float)
+    for velo in body["top_velos"]:
+        assert isinstance(velo["duree_totale_heures"], float)
+
+
+@pytest.mark.parametrize("periode", ["jour", "semaine", "mois", "annee"])
+def test_velo_stations_count_periods(api_client, periode):
+    response = api_client.get(
+        f"{ANALYSIS}/velos/v1/stations_visitees",
+        params={"periode": periode, "date_ref": "2024-09-15"},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["periode"] == periode
+    assert isinstance(body["nombre_stations_visitees"], int)
+
+
+def test_velo_stations_count_invalid_period(api_client):
+    response = api_client.get(f"{ANALYSIS}/velos/v1/stations_visitees", params={"periode": "siecle"})
+    assert response.status_code == 400
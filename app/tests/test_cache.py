@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+from cache import cached
+
+
+def test_late_request_waits_for_pending_computation():
+    calls = 0
+
+    @cached(ttl=60)
+    async def endpoint(station_code: str):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        if calls == 1:
+            raise RuntimeError("base indisponible")
+        return {"station_code": station_code}
+
+    async def run():
+        first = asyncio.create_task(endpoint(station_code="16107"))
+        waiting = asyncio.create_task(endpoint(station_code="16107"))
+        with pytest.raises(RuntimeError):
+            await first
+        # La requête en attente recalcule : une requête arrivée maintenant
+        # doit attendre son résultat au lieu de relancer le calcul.
+        await asyncio.sleep(0.005)
+        late = await endpoint(station_code="16107")
+        return await waiting, late
+
+    results = asyncio.run(run())
+    assert calls == 2
+    assert results == ({"station_code": "16107"}, {"station_code": "16107"})
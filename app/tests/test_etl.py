@@ -0,0 +1,96 @@
+import datetime as dt
+
+import psycopg2
+import pytest
+
+import etl
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeCursor:
+    """
+    Curseur minimal : enregistre les requêtes et peut faire échouer
+    l'INSERT d'une table donnée (comme une violation de contrainte).
+    """
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.fail_on_table = None
+
+    def execute(self, sql, params=None):
+        if self.fail_on_table and f"INSERT INTO {self.fail_on_table} " in sql:
+            raise psycopg2.Error(f"constraint violation on {self.fail_on_table}")
+
+
+@pytest.fixture
+def copied(monkeypatch):
+    """
+    Remplace COPY et l'insertion des snapshots : retourne {table de staging: [lignes]}.
+    """
+    rows_by_table = {}
+
+    def fake_copy_rows(cursor, table, columns, rows):
+        rows_by_table.setdefault(table, []).extend(rows)
+
+    def fake_insert_snapshots(cursor, timestamps):
+        return {ts: i for i, ts in enumerate(timestamps, 1)}
+
+    monkeypatch.setattr(etl, "copy_rows", fake_copy_rows)
+    monkeypatch.setattr(etl, "insert_snapshots", fake_insert_snapshots)
+    yield rows_by_table
+
+    etl.discard_buffers()
+    etl._seen_stations.clear()
+    etl._seen_velos.clear()
+
+
+def parsed_file(minute):
+    timestamp = dt.datetime(2024, 9, 15, 17, minute)
+    station_rows = [("2000", "Gare", 48.8, 2.3, "STANDARD", "yes")]
+    velo_rows = [("v1", False)]
+    etat_rows = [("2000", "Operative", 1, 2, 3)]
+    loc_rows = [("v1", "2000", "disponible", "3")]
+    return timestamp, station_rows, velo_rows, etat_rows, loc_rows
+
+
+def test_failed_batch_keys_are_resent_by_next_batch(copied):
+    cursor = FakeCursor()
+    progress = {"done": set()}
+    errors = {"batch_error": 0}
+
+    # Batch 1 : station et vélo insérés, puis échec sur etat_station -> rollback
+    etl.buffer_parsed_file(parsed_file(0))
+    cursor.fail_on_table = "etat_station"
+    batch_files = ["f1"]
+    assert etl.commit_batch(cursor, progress, batch_files, errors) == 0
+    assert errors["batch_error"] == 1
+    assert "2000" not in etl._seen_stations
+    assert "v1" not in etl._seen_velos
+
+    # Batch 2 : les clés annulées doivent être renvoyées
+    copied.clear()
+    cursor.fail_on_table = None
+    etl.buffer_parsed_file(parsed_file(1))
+    batch_files = ["f2"]
+    assert etl.commit_batch(cursor, progress, batch_files, errors) == 1
+    assert [row[0] for row in copied["staging_station"]] == ["2000"]
+    assert [row[0] for row in copied["staging_velo"]] == ["v1"]
+    assert progress["done"] == {"f2"}
+
+    # Batch 3 : clés validées, plus renvoyées
+    copied.clear()
+    etl.buffer_parsed_file(parsed_file(2))
+    batch_files = ["f3"]
+    assert etl.commit_batch(cursor, progress, batch_files, errors) == 1
+    assert "staging_station" not in copied
+    assert "staging_velo" not in copied